@@ -12,29 +12,100 @@
 # 
 # DEPENDÊNCIAS NECESSÁRIAS:
 # - Flask: Framework web para Python
-# - PyMySQL: Conector para banco de dados MySQL
+# - mysqlclient (MySQLdb): Conector MySQL em C (libmysqlclient)
+# - DBUtils: Pool de conexões reaproveitadas entre requisições
+# - argon2-cffi: Hash seguro de senhas
+# - cachetools: Cache em memória com tempo de expiração
+# - dogpile.cache: Cache das listagens de autopeças
+# - pydantic: Conversão e validação dos formulários
+# - orjson: Serialização JSON rápida para respostas jsonify()
 # - datetime: Para manipulação de datas (padrão do Python)
 # 
 # ESTRUTURA DO BANCO DE DADOS:
-# - Tabela 'usuarios': ID_USUARIO, EMAIL, SENHA, NOME_COMPLETO
-# - Tabela 'autopecas': ID_PECA, NOME_PECA, NUM_SERIAL, ESTOQUE, ESTOQUE_MINIMO, PRECO, DESCRICAO
+# - Tabela 'usuario': ID_USUARIO, EMAIL, SENHA, NOME
+# - Tabela 'autopeca': ID_PECA, NOME_PECA, NUM_SERIAL, ESTOQUE, ESTOQUE_MINIMO, PRECO, DESCRICAO
+# - Tabela 'movimentacoes': ID_MOVI, ID_USUARIO, ID_PECA, DATA_MOVI, QUANTIDADE, TIPO_MOVI
 # 
 # INSTALAÇÃO DAS DEPENDÊNCIAS:
-# pip install flask pymysql
+# pip install flask mysqlclient DBUtils argon2-cffi cachetools dogpile.cache pydantic orjson gunicorn
 # 
 # COMO EXECUTAR:
-# python app.py
+# Desenvolvimento:  python app.py
+# Produção:         gunicorn -w $(nproc) -k gthread --threads 16 -b 0.0.0.0:5000 app:app
 # Acessar: http://localhost:5000
+#
+# Cada requisição passa quase todo o tempo esperando o MySQL responder.
+# Em produção, os workers gthread do gunicorn (opção de implantação, não
+# de código) usam várias threads por processo: umas atendem requisições
+# enquanto outras aguardam o banco (o GIL é liberado durante I/O).
 # ================================================================================
 
 # IMPORTAÇÕES
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-import pymysql                # Biblioteca para conectar com MySQL
+from flask import (Flask, render_template, stream_template, request, redirect, url_for,
+                   session, flash, get_flashed_messages, g)
+import MySQLdb                # Biblioteca para conectar com MySQL (driver em C)
+import MySQLdb.cursors        # DictCursor: linhas como dicionários
+from MySQLdb.constants import CLIENT  # Flags de conexão do cliente MySQL
+import hmac                   # Comparação de senhas em tempo constante
+import logging                # Registro de erros (em vez de print)
+import os                     # Variáveis de ambiente e diretórios
+import re                     # Separação das palavras da busca
+import threading              # Trava para criar o pool uma única vez
+from argon2 import PasswordHasher  # Hash de senhas (Argon2)
+from argon2.exceptions import InvalidHashError, VerificationError
+from cachetools import LRUCache, TTLCache  # Caches em memória limitados
+from dogpile.cache import make_region  # Cache das listagens de autopeças
+from pydantic import BaseModel, ValidationError, conint, condecimal  # Validação de formulários
 from datetime import datetime # Para trabalhar com datas e horários
+from dbutils.pooled_db import PooledDB  # Pool de conexões MySQL
+from jinja2 import FileSystemBytecodeCache  # Cache dos templates compilados
+from flask.json.provider import DefaultJSONProvider
+import orjson                 # Serialização JSON rápida (implementada em Rust)
 
 # INICIALIZAÇÃO DA APLICAÇÃO FLASK
 app = Flask(__name__)
 
+# MODO DEBUG
+# Desligado por padrão. Para desenvolvimento: SAEP_DEBUG=1 python app.py
+DEBUG = os.environ.get('SAEP_DEBUG') == '1'
+
+# CACHE DE TEMPLATES
+# Os templates Jinja2 compilados ficam gravados em disco: ao iniciar um
+# novo worker (ou reiniciar o servidor), os templates são carregados do
+# cache em vez de serem analisados novamente a partir do HTML.
+# TEMPLATES_AUTO_RELOAD: fora do modo debug, o Flask não verifica a cada
+# requisição se o arquivo do template mudou.
+# Sem diretório informado, o Jinja2 usa _jinja2-cache-<uid> no diretório
+# temporário, criado com permissão 0700 e recusado se pertencer a outro
+# usuário: o cache guarda código compilado, que não pode ser adulterado.
+app.config['TEMPLATES_AUTO_RELOAD'] = DEBUG
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+
+# LOGS
+# logging em vez de print(): nada é escrito no stdout em requisições
+# normais (print() a cada conexão disputava a trava do stdout entre as
+# threads); apenas erros de conexão são registrados, com o traceback.
+logger = logging.getLogger(__name__)
+
+# JSON COM ORJSON
+# jsonify() e respostas que retornam dict/list passam a usar o orjson.
+# Tipos que o orjson não conhece (ex.: Decimal da coluna PRECO) são
+# convertidos pelo mesmo default() do provedor padrão do Flask.
+class OrjsonProvider(DefaultJSONProvider):
+    """Provedor JSON do Flask baseado no orjson."""
+    
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+app.json = OrjsonProvider(app)
+
 # CHAVE SECRETA
 # Necessária para criptografar sessões e cookies
 # EM PRODUÇÃO: Use uma chave mais complexa e armazene em variável de ambiente
@@ -51,6 +122,9 @@ app.secret_key = 'chave_secreta_saep_2025'
 # - database: nome do banco criado
 # - charset: codificação para suportar acentos
 # - autocommit: confirma automaticamente as transações
+# - client_flag: MULTI_STATEMENTS permite enviar vários comandos SQL em um
+#   único execute() (usado em add_movimentacao). Todas as consultas usam
+#   parâmetros (%s), então não há concatenação de texto do usuário no SQL.
 DB_CONFIG = {
     'host': '127.0.0.1',        # Localhost
     'port': 3306,               # Porta padrão MySQL
@@ -58,25 +132,50 @@ DB_CONFIG = {
     'password': '',             # Senha vazia (padrão XAMPP)
     'database': 'SAEB_DB',      # Nome do banco criado
     'charset': 'utf8mb4',       # Suporte completo UTF-8
-    'autocommit': True          # Auto-confirma transações
+    'autocommit': True,         # Auto-confirma transações
+    'client_flag': CLIENT.MULTI_STATEMENTS  # Vários comandos por execute()
+}
+
+# CONFIGURAÇÃO DO POOL DE CONEXÕES
+#
+# Abrir uma conexão MySQL custa handshake TCP, autenticação e negociação
+# de charset. O pool mantém conexões "quentes" e as empresta a cada
+# requisição; conn.close() devolve a conexão ao pool em vez de encerrá-la.
+# - mincached: conexões abertas já na criação do pool
+# - maxcached: máximo de conexões ociosas mantidas
+# - maxconnections: limite total de conexões simultâneas
+# - blocking: se o limite for atingido, espera em vez de gerar erro
+POOL_CONFIG = {
+    'mincached': 5,
+    'maxcached': 20,
+    'maxconnections': 50,
+    'blocking': True
 }
 
+# O pool é criado na primeira requisição (e não na importação do módulo),
+# assim a aplicação sobe mesmo que o MySQL ainda não esteja disponível.
+_pool = None
+_pool_lock = threading.Lock()
+
 # ================================================================================
 # FUNÇÃO DE CONEXÃO COM O BANCO DE DADOS
 # ================================================================================
 
 def get_db_connection():
     """
-    Estabelece conexão com o banco de dados MySQL.
+    Obtém uma conexão com o banco de dados MySQL a partir do pool.
     
     Esta função centraliza a lógica de conexão, facilitando manutenção e debug.
+    Na primeira chamada o pool é criado; nas seguintes, uma conexão já aberta
+    é reaproveitada.
     
     Returns:
-        pymysql.Connection: Objeto de conexão se bem-sucedida
+        PooledDedicatedDBConnection: Conexão do pool se bem-sucedida
+            (conn.close() devolve a conexão ao pool)
         None: Se houver erro na conexão
     
     Tratamento de erros:
-        - pymysql.Error: Erros específicos do MySQL (credenciais, rede, etc.)
+        - MySQLdb.Error: Erros específicos do MySQL (credenciais, rede, etc.)
         - Exception: Outros erros gerais
     
     Como usar:
@@ -85,31 +184,577 @@ def get_db_connection():
             # usar a conexão
             conn.close()
     """
+    global _pool
     try:
-        print("Tentando conectar ao banco de dados...")
-        
-        # **DB_CONFIG desempacota o dicionário como parâmetros nomeados
-        connection = pymysql.connect(**DB_CONFIG)
+        if _pool is None:
+            with _pool_lock:
+                if _pool is None:
+                    # creator=MySQLdb: o pool chama MySQLdb.connect(**DB_CONFIG)
+                    _pool = PooledDB(creator=MySQLdb, **POOL_CONFIG, **DB_CONFIG)
         
-        print("Conexão bem-sucedida!")
-        return connection
+        return _pool.connection()
         
-    except pymysql.Error as e:
+    except MySQLdb.Error as e:
         # Erros específicos do MySQL (banco não existe, credenciais inválidas, etc.)
-        print(f'Erro MySQL: {e}')
+        logger.exception('Erro MySQL ao conectar')
         flash(f'Erro ao conectar com o banco de dados MySQL: {e}', 'error')
         return None
         
     except Exception as e:
         # Outros erros gerais (rede, firewall, etc.)
-        print(f'Erro geral: {e}')
+        logger.exception('Erro geral ao conectar')
         flash(f'Erro geral ao conectar: {e}', 'error')
         return None
 
+# ================================================================================
+# CONSULTAS SQL
+# ================================================================================
+
+# Todas as consultas do sistema são fixas e ficam definidas aqui, uma única
+# vez, ao carregar o módulo. Os valores variáveis entram sempre como
+# parâmetros (%s), nunca concatenados no texto.
+
+# Login: usuário pelo email (a senha é conferida em Python)
+SQL_USUARIO_POR_EMAIL = "SELECT ID_USUARIO, NOME, SENHA FROM usuario WHERE EMAIL = %s LIMIT 1"
+
+# Login: regrava a SENHA como hash Argon2 atualizado
+SQL_USUARIO_ATUALIZAR_SENHA = "UPDATE usuario SET SENHA = %s WHERE ID_USUARIO = %s"
+
+# Listagem: uma página de autopeças filtrada pela busca FULLTEXT
+SQL_AUTOPECAS_BUSCA = """
+    SELECT a.*,
+           (a.ESTOQUE <= a.ESTOQUE_MINIMO) AS low_stock
+    FROM autopeca a
+    WHERE MATCH(NOME_PECA, NUM_SERIAL) AGAINST (%s IN BOOLEAN MODE)
+      AND (NOME_PECA > %s OR (NOME_PECA = %s AND ID_PECA > %s))
+    ORDER BY NOME_PECA, ID_PECA
+    LIMIT %s
+"""
+
+# Listagem: uma página de todas as autopeças
+SQL_AUTOPECAS_LISTA = """
+    SELECT a.*,
+           (a.ESTOQUE <= a.ESTOQUE_MINIMO) AS low_stock
+    FROM autopeca a
+    WHERE NOME_PECA > %s OR (NOME_PECA = %s AND ID_PECA > %s)
+    ORDER BY NOME_PECA, ID_PECA
+    LIMIT %s
+"""
+
+# Estoque: uma página de autopeças com a data da última movimentação
+# (só /estoque exibe ultima_movi; /autopecas não paga pela subconsulta)
+SQL_ESTOQUE_LISTA = """
+    SELECT a.*,
+           (a.ESTOQUE <= a.ESTOQUE_MINIMO) AS low_stock,
+           (SELECT MAX(m.DATA_MOVI) FROM movimentacoes m
+            WHERE m.ID_PECA = a.ID_PECA) AS ultima_movi
+    FROM autopeca a
+    WHERE NOME_PECA > %s OR (NOME_PECA = %s AND ID_PECA > %s)
+    ORDER BY NOME_PECA, ID_PECA
+    LIMIT %s
+"""
+
+# Estoque: todas as autopeças para o campo de seleção da movimentação
+# (sem paginação e só com as colunas exibidas no <select>)
+SQL_AUTOPECAS_OPCOES = """
+    SELECT ID_PECA, NOME_PECA, NUM_SERIAL, ESTOQUE
+    FROM autopeca
+    ORDER BY NOME_PECA, ID_PECA
+"""
+
+# Cadastro de autopeça
+SQL_AUTOPECA_INSERIR = """
+    INSERT INTO autopeca (NOME_PECA, DESCRICAO, ESTOQUE, ESTOQUE_MINIMO,
+                         NUM_SERIAL, COMPATIBILIDADE, PRECO)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Edição: autopeça pelo ID
+SQL_AUTOPECA_POR_ID = "SELECT * FROM autopeca WHERE ID_PECA = %s"
+
+# Atualização de todos os campos da autopeça
+SQL_AUTOPECA_ATUALIZAR = """
+    UPDATE autopeca
+    SET NOME_PECA=%s, DESCRICAO=%s, ESTOQUE=%s, ESTOQUE_MINIMO=%s,
+        NUM_SERIAL=%s, COMPATIBILIDADE=%s, PRECO=%s
+    WHERE ID_PECA=%s
+"""
+
+# Exclusão de autopeça
+SQL_AUTOPECA_EXCLUIR = "DELETE FROM autopeca WHERE ID_PECA = %s"
+
+# Estoque: as 10 movimentações mais recentes
+SQL_MOVIMENTACOES_RECENTES = """
+    SELECT m.*, a.NOME_PECA, u.NOME as usuario_nome
+    FROM movimentacoes m
+    JOIN autopeca a ON m.ID_PECA = a.ID_PECA
+    JOIN usuario u ON m.ID_USUARIO = u.ID_USUARIO
+    ORDER BY m.DATA_MOVI DESC
+    LIMIT 10
+"""
+
+# Movimentação de estoque: transação completa em um único execute()
+SQL_MOVIMENTACAO_REGISTRAR = """
+    START TRANSACTION;
+    UPDATE autopeca SET ESTOQUE = ESTOQUE + %s
+    WHERE ID_PECA = %s AND ESTOQUE + %s >= 0;
+    SET @movimentada := ROW_COUNT();
+    INSERT INTO movimentacoes (ID_USUARIO, ID_PECA, DATA_MOVI, QUANTIDADE, TIPO_MOVI)
+    SELECT %s, %s, %s, %s, %s FROM DUAL WHERE @movimentada > 0;
+    SELECT NOME_PECA, ESTOQUE, ESTOQUE_MINIMO, @movimentada AS movimentada
+    FROM autopeca WHERE ID_PECA = %s;
+    COMMIT
+"""
+
+# ================================================================================
+# AUTENTICAÇÃO DE USUÁRIOS
+# ================================================================================
+
+# HASH DE SENHAS
+# As senhas ficam gravadas como hash Argon2 na coluna SENHA.
+# Para gerar o hash de uma nova senha: PH.hash('minha_senha')
+#
+# Bancos antigos ainda têm senhas em texto puro. Elas continuam aceitas
+# no login e são convertidas para Argon2 assim que o usuário entra
+# (ver password_needs_rehash e rehash_password).
+PH = PasswordHasher()
+ARGON2_PREFIX = '$argon2'
+
+# Hash fictício (calculado uma vez, ao iniciar): quando o email não existe,
+# ou a SENHA ainda está em texto puro, a senha digitada é conferida contra
+# ele. Assim todo login paga o custo do Argon2 e o tempo de resposta não
+# revela quais emails estão cadastrados.
+HASH_FICTICIO = PH.hash('senha-ficticia-para-tempo-constante')
+
+# CACHE DE USUÁRIOS
+# A busca email → usuário é uma consulta pura; guardamos o resultado por
+# 60 segundos para evitar ir ao banco em logins repetidos.
+# TTLCache não é thread-safe, por isso o acesso passa pela trava.
+USER_CACHE = TTLCache(maxsize=1024, ttl=60)
+_user_cache_lock = threading.Lock()
+
+
+def get_user_by_email(email):
+    """
+    Busca o usuário pelo email, consultando primeiro o cache em memória.
+    
+    Returns:
+        dict: ID_USUARIO, NOME e SENHA (hash) do usuário
+        None: Se nenhum usuário tiver este email
+    
+    Raises:
+        ConnectionError: Se não for possível obter conexão com o banco
+            (a mensagem de erro já foi exibida por get_db_connection)
+        MySQLdb.Error: Se a consulta falhar
+    """
+    with _user_cache_lock:
+        user = USER_CACHE.get(email)
+    if user is not None:
+        return user
+    
+    conn = get_db_connection()
+    if not conn:
+        raise ConnectionError('Sem conexão com o banco de dados')
+    
+    cursor = conn.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        # A senha é conferida em Python (verify_password), então a busca
+        # é feita só pelo email. LIMIT 1: para no primeiro registro
+        cursor.execute(
+            SQL_USUARIO_POR_EMAIL,
+            (email,)
+        )
+        user = cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+    
+    # Emails inexistentes não são guardados: um usuário recém-cadastrado
+    # consegue entrar imediatamente
+    if user:
+        with _user_cache_lock:
+            USER_CACHE[email] = user
+    return user
+
+
+def verify_password(senha_hash, senha):
+    """
+    Confere a senha digitada com o hash Argon2 armazenado.
+    
+    Se SENHA ainda estiver em texto puro (bancos criados antes do Argon2),
+    compara diretamente, em tempo constante (hmac.compare_digest).
+    
+    senha_hash=None (email inexistente) sempre falha, mas só depois de
+    conferir a senha contra HASH_FICTICIO: gasta o mesmo tempo que um
+    usuário existente.
+    
+    Returns:
+        bool: True se a senha confere, False caso contrário
+    """
+    if senha_hash is None or not senha_hash.startswith(ARGON2_PREFIX):
+        try:
+            PH.verify(HASH_FICTICIO, senha)
+        except VerificationError:
+            pass
+        if senha_hash is None:
+            return False
+        return hmac.compare_digest(senha_hash.encode('utf-8'), senha.encode('utf-8'))
+    try:
+        return PH.verify(senha_hash, senha)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def password_needs_rehash(senha_hash):
+    """
+    Indica se a SENHA gravada deve ser regravada após um login válido.
+    
+    Returns:
+        bool: True se SENHA estiver em texto puro ou se o hash Argon2
+            usar parâmetros diferentes dos atuais do PasswordHasher
+    """
+    if not senha_hash.startswith(ARGON2_PREFIX):
+        return True
+    try:
+        return PH.check_needs_rehash(senha_hash)
+    except InvalidHashError:
+        return True
+
+
+def rehash_password(user, email, senha):
+    """
+    Regrava a SENHA do usuário como hash Argon2 com os parâmetros atuais.
+    
+    Chamada só depois de verify_password confirmar a senha. Uma falha aqui
+    não impede o login: a conversão é tentada de novo no próximo acesso.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return
+    
+    cursor = conn.cursor()
+    try:
+        cursor.execute(SQL_USUARIO_ATUALIZAR_SENHA, (PH.hash(senha), user['ID_USUARIO']))
+        conn.commit()
+    except MySQLdb.Error:
+        conn.rollback()
+        logger.exception('Erro ao atualizar o hash da senha')
+        return
+    finally:
+        cursor.close()
+        conn.close()
+    
+    # O cache guarda a SENHA antiga; a próxima busca lê o hash novo
+    with _user_cache_lock:
+        USER_CACHE.pop(email, None)
+
+# ================================================================================
+# CONSULTAS DE AUTOPEÇAS (COM CACHE)
+# ================================================================================
+
+# CACHE DAS LISTAGENS
+#
+# As listagens de /autopecas e /estoque só mudam quando uma autopeça é
+# adicionada, editada, excluída ou movimentada. Entre essas operações,
+# o resultado fica em memória por até 5 minutos (expiration_time=300).
+# As rotas de escrita chamam invalidate_autopecas_cache() após o commit.
+#
+# O backend 'memory' guarda o cache dentro de cada processo. Com vários
+# workers (gunicorn -w N), a invalidação só vale para o worker que fez a
+# alteração; os demais podem exibir dados antigos até expirar. Nesse caso,
+# configure o backend 'dogpile.cache.redis' para compartilhar o cache e
+# guarde também a geração (ver abaixo) no Redis, com INCR.
+#
+# Por padrão o backend 'memory' usa um dict sem limite, e invalidate()
+# não remove as entradas antigas: cada termo de busca e cada página
+# ficariam na memória para sempre. Por isso ele recebe um LRUCache
+# limitado (as listagens menos acessadas saem primeiro).
+class LockedLRUCache(LRUCache):
+    """LRUCache com trava: até a leitura altera a ordem de uso, e as rotas rodam em várias threads."""
+    
+    def __init__(self, maxsize):
+        super().__init__(maxsize)
+        self._lock = threading.RLock()
+    
+    def __getitem__(self, key):
+        with self._lock:
+            return super().__getitem__(key)
+    
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+    
+    def __delitem__(self, key):
+        with self._lock:
+            super().__delitem__(key)
+    
+    def get(self, key, default=None):
+        with self._lock:
+            return super().get(key, default)
+    
+    def pop(self, key, *default):
+        with self._lock:
+            return super().pop(key, *default)
+    
+    def clear(self):
+        with self._lock:
+            super().clear()
+
+
+# Até 256 páginas de listagem (no máximo PAGE_SIZE linhas cada)
+_autopecas_cache = LockedLRUCache(maxsize=256)
+
+
+# GERAÇÃO DO CACHE
+# Cada escrita em autopeca incrementa a geração, que faz parte da chave.
+# Uma leitura que começou antes da escrita e termina depois dela grava o
+# resultado (já desatualizado) na chave da geração anterior, que ninguém
+# lê mais. Só invalidate() não bastaria: o dogpile data a entrada pelo
+# momento em que ela é gravada, e ela pareceria mais nova que a invalidação.
+_autopecas_geracao = 0
+_autopecas_geracao_lock = threading.Lock()
+
+
+def autopecas_key_generator(namespace, fn, **kw):
+    """
+    Gera as chaves do cache: geração atual, nome da função e argumentos.
+    
+    Os argumentos entram com repr(). A chave padrão do dogpile junta os
+    argumentos com espaços, e dois textos livres (busca e paginação)
+    podiam cair na mesma chave e trazer a página de outra consulta:
+    
+    >>> gerar = autopecas_key_generator(None, list_autopecas)
+    >>> gerar('filtro oleo', 'x', 0) == gerar('filtro', 'oleo x', 0)
+    False
+    """
+    prefixo = f'{fn.__module__}:{fn.__name__}'
+    if namespace:
+        prefixo = f'{prefixo}|{namespace}'
+    
+    def gerar_chave(*args):
+        return f'{_autopecas_geracao}|{prefixo}|{args!r}'
+    
+    return gerar_chave
+
+
+autopecas_region = make_region(function_key_generator=autopecas_key_generator).configure(
+    'dogpile.cache.memory',
+    expiration_time=300,
+    arguments={'cache_dict': _autopecas_cache}
+)
+
+
+def fulltext_query(search):
+    """
+    Monta a expressão de busca FULLTEXT (BOOLEAN MODE) a partir do termo digitado.
+    
+    Cada palavra vira '+palavra*': todas as palavras são obrigatórias e
+    cada uma casa como prefixo ('filt' encontra 'filtro').
+    Exemplo: 'filtro oleo' → '+filtro* +oleo*'
+    
+    O termo é separado em qualquer caractere que não seja letra ou dígito,
+    assim como o MySQL faz ao indexar: operadores do BOOLEAN MODE
+    (+ - < > ( ) ~ * " @) e pontuação nunca chegam ao AGAINST.
+    Exemplo: 'ABC-123' → '+ABC* +123*'
+    
+    Observação: palavras menores que innodb_ft_min_token_size (padrão 3)
+    e stopwords do MySQL não são indexadas.
+    
+    Returns:
+        str: Expressão para AGAINST (vazia se não sobrar nenhuma palavra)
+    """
+    palavras = re.findall(r'\w+', search)
+    return ' '.join(f'+{palavra}*' for palavra in palavras)
+
+
+# PAGINAÇÃO
+# Quantidade de autopeças exibidas por página nas listagens
+PAGE_SIZE = 50
+
+
+def _fetch_autopecas(sql, params):
+    """
+    Executa uma consulta de listagem de autopeças e lê todas as linhas.
+    
+    Returns:
+        tuple: Linhas como dicionários
+        None: Se não for possível conectar ao banco
+    """
+    conn = get_db_connection()
+    if not conn:
+        return None
+    
+    # DictCursor comum: a consulta traz no máximo PAGE_SIZE linhas (LIMIT),
+    # então ler tudo de uma vez é barato e libera a conexão logo
+    cursor = conn.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        cursor.execute(sql, params)
+        
+        # Cada linha é um dicionário (devido ao DictCursor)
+        return cursor.fetchall()
+    finally:
+        # SEMPRE fechar recursos
+        cursor.close()
+        conn.close()
+
+
+# should_cache_fn: None indica falha de conexão, que não deve ir para o cache
+@autopecas_region.cache_on_arguments(should_cache_fn=lambda result: result is not None)
+def list_autopecas(search, after_nome='', after_id=0):
+    """
+    Lista uma página de autopeças ordenadas por nome, filtrando pelo termo de busca.
+    
+    Paginação por chave (keyset): em vez de OFFSET, a consulta continua a
+    partir da última peça exibida (NOME_PECA, ID_PECA). O MySQL percorre só
+    as PAGE_SIZE linhas da página pelo índice, qualquer que seja a página.
+    O ID_PECA desempata peças com o mesmo nome.
+    
+    low_stock (1/0) indica estoque baixo (ESTOQUE <= ESTOQUE_MINIMO),
+    já calculado pelo MySQL para os templates.
+    
+    O resultado fica em cache, indexado pelos parâmetros.
+    
+    Parâmetros:
+    - search: termo buscado no nome ou número de série ('' lista todas)
+    - after_nome, after_id: última peça da página anterior
+      ('' e 0 para a primeira página)
+    
+    Returns:
+        tuple: Até PAGE_SIZE linhas da tabela autopeca como dicionários
+        None: Se não for possível conectar ao banco
+    
+    Raises:
+        MySQLdb.Error: Se a consulta falhar (o erro não é guardado em cache)
+    """
+    termos = fulltext_query(search)
+    
+    # LÓGICA DE BUSCA CONDICIONAL
+    if termos:
+        # BUSCA COM FILTRO
+        # MATCH ... AGAINST usa o índice FULLTEXT idx_ft_autopeca,
+        # sem varrer a tabela inteira como LIKE '%termo%'
+        # Busca tanto no nome da peça quanto no número serial
+        return _fetch_autopecas(SQL_AUTOPECAS_BUSCA, (termos, after_nome, after_nome, after_id, PAGE_SIZE))
+    
+    # LISTAR TODAS (sem filtro)
+    # Ordena por nome para facilitar localização
+    return _fetch_autopecas(SQL_AUTOPECAS_LISTA, (after_nome, after_nome, after_id, PAGE_SIZE))
+
+
+@autopecas_region.cache_on_arguments(should_cache_fn=lambda result: result is not None)
+def list_estoque(after_nome='', after_id=0):
+    """
+    Lista uma página de autopeças para /estoque (mesma ordem e paginação
+    de list_autopecas, sem busca).
+    
+    Cada peça vem também com a data da sua última movimentação
+    (ultima_movi), calculada na mesma consulta: não é preciso um SELECT
+    extra por peça. Só /estoque exibe essa data.
+    
+    Returns:
+        tuple: Até PAGE_SIZE linhas da tabela autopeca como dicionários
+        None: Se não for possível conectar ao banco
+    
+    Raises:
+        MySQLdb.Error: Se a consulta falhar (o erro não é guardado em cache)
+    """
+    return _fetch_autopecas(SQL_ESTOQUE_LISTA, (after_nome, after_nome, after_id, PAGE_SIZE))
+
+
+def invalidate_autopecas_cache():
+    """Descarta todas as listagens em cache (chamar após alterar autopecas)."""
+    global _autopecas_geracao
+    with _autopecas_geracao_lock:
+        _autopecas_geracao += 1
+    # As entradas da geração anterior não são mais lidas; clear() libera a memória
+    _autopecas_cache.clear()
+
+# ================================================================================
+# VALIDAÇÃO DO FORMULÁRIO DE AUTOPEÇAS
+# ================================================================================
+
+class AutopecaForm(BaseModel):
+    """
+    Campos do formulário de autopeça (cadastro e edição).
+    
+    O pydantic converte os textos do formulário para os tipos declarados
+    e aplica as regras de negócio em uma única etapa:
+    - estoque e estoque_minimo: inteiros, não negativos
+    - preco: decimal maior que zero, no formato da coluna DECIMAL(10,2)
+      (até 8 dígitos inteiros e 2 casas decimais)
+    """
+    nome_peca: str
+    descricao: str
+    num_serie: str
+    compatibilidade: str
+    estoque: conint(ge=0)
+    estoque_minimo: conint(ge=0)
+    preco: condecimal(gt=0, max_digits=10, decimal_places=2)
+
+
+# Mensagens para valores fora das regras de negócio, por campo
+AUTOPECA_FORM_ERRORS = {
+    'estoque': 'Estoque não pode ser negativo',
+    'estoque_minimo': 'Estoque mínimo não pode ser negativo',
+    'preco': 'Preço deve ser maior que zero'
+}
+
+# Preço que não cabe em DECIMAL(10,2): o MySQL recusaria ou arredondaria
+PRECO_FORMATO_ERRO = 'Preço deve ter no máximo 8 dígitos inteiros e 2 casas decimais'
+DECIMAL_ERROS = ('decimal_max_digits', 'decimal_max_places', 'decimal_whole_digits')
+
+
+def parse_autopeca_form(form):
+    """
+    Converte e valida os dados do formulário de autopeça.
+    
+    Returns:
+        tuple: (AutopecaForm, None) se os dados forem válidos
+               (None, mensagem de erro) caso contrário
+    """
+    try:
+        return AutopecaForm.model_validate(form.to_dict()), None
+    except ValidationError as e:
+        # Exibe apenas o primeiro problema encontrado
+        erro = e.errors()[0]
+        campo = erro['loc'][0]
+        if erro['type'] == 'missing':
+            return None, f'Campo obrigatório não informado: {campo}'
+        if erro['type'] in ('greater_than', 'greater_than_equal'):
+            return None, AUTOPECA_FORM_ERRORS[campo]
+        if erro['type'] in DECIMAL_ERROS:
+            return None, PRECO_FORMATO_ERRO
+        return None, 'Valores numéricos inválidos. Verifique estoque e preço.'
+
 # ================================================================================
 # ROTAS DA APLICAÇÃO
 # ================================================================================
 
+# Rotas acessíveis sem login
+PUBLIC_ENDPOINTS = {'login', 'static'}
+
+
+@app.before_request
+def require_login():
+    """
+    VERIFICAÇÃO DE AUTENTICAÇÃO (executada antes de toda requisição)
+    
+    Centraliza a proteção das rotas: se não existe 'user_id' na sessão,
+    o usuário não está logado e é redirecionado para o login.
+    Rotas em PUBLIC_ENDPOINTS não exigem login.
+    
+    Para usuários logados, guarda o ID em g.user_id
+    (g vale só durante a requisição atual).
+    """
+    if request.endpoint in PUBLIC_ENDPOINTS:
+        return None
+    
+    user_id = session.get('user_id')
+    if user_id is None:
+        return redirect(URL_LOGIN)
+    g.user_id = user_id
+
+
 @app.route('/')
 def index():
     """
@@ -117,14 +762,9 @@ def index():
     
     Redireciona usuários para a página apropriada:
     - Se já está logado → Dashboard
-    - Se não está logado → Login
-    
-    Verifica se existe 'user_id' na sessão Flask.
-    Sessão persiste dados entre requisições do mesmo usuário.
+    - Se não está logado → Login (feito por require_login())
     """
-    if 'user_id' in session:
-        return redirect(url_for('dashboard'))
-    return redirect(url_for('login'))
+    return redirect(URL_DASHBOARD)
 
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -138,8 +778,9 @@ def login():
     
     Processo de autenticação:
     1. Recebe email e senha do formulário
-    2. Busca usuário no banco de dados
-    3. Verifica se credenciais coincidem
+    2. Busca usuário pelo email (cache em memória ou banco de dados)
+    3. Confere a senha com o hash Argon2 armazenado
+       (senhas antigas em texto puro são convertidas para Argon2 aqui)
     4. Se válidas: cria sessão e redireciona para dashboard
     5. Se inválidas: exibe mensagem de erro
     """
@@ -148,43 +789,38 @@ def login():
         email = request.form['email']    # Campo name="email" do HTML
         senha = request.form['senha']    # Campo name="senha" do HTML
         
-        # Tenta estabelecer conexão com banco
-        conn = get_db_connection()
-        if conn:
-            try:
-                # Cria cursor que retorna resultados como dicionários
-                # DictCursor permite acessar campos por nome: user['EMAIL']
-                cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            user = get_user_by_email(email)
+            
+            # Email inexistente também passa pelo Argon2 (senha_hash=None),
+            # para que o tempo de resposta seja o mesmo nos dois casos
+            senha_ok = verify_password(user['SENHA'] if user else None, senha)
+            
+            if user and senha_ok:
+                # AUTENTICAÇÃO BEM-SUCEDIDA
+                # Senha em texto puro ou hash desatualizado: regrava em Argon2
+                if password_needs_rehash(user['SENHA']):
+                    rehash_password(user, email, senha)
                 
-                # CONSULTA SQL SEGURA usando parâmetros (%s)
-                # Previne SQL Injection - NUNCA concatenar strings diretamente!
-                # Busca usuário com email E senha exatos
-                cursor.execute("SELECT * FROM usuario WHERE EMAIL = %s AND SENHA = %s", (email, senha))
+                # Armazena dados do usuário na sessão Flask
+                # session[] persiste entre requisições do mesmo usuário
+                session['user_id'] = user['ID_USUARIO']    # ID para queries futuras
+                session['user_name'] = user['NOME']        # Nome para exibição
                 
-                # fetchone() retorna apenas 1 resultado (ou None se não encontrar)
-                user = cursor.fetchone()
+                # Redireciona para dashboard após login
+                return redirect(URL_DASHBOARD)
+            else:
+                # CREDENCIAIS INVÁLIDAS
+                # flash() cria mensagem temporária para próxima página
+                # Categoria 'error' define cor/estilo da mensagem
+                # Mesma mensagem para email inexistente e senha errada
+                flash('Credenciais inválidas. Tente novamente.', 'error')
                 
-                if user:
-                    # AUTENTICAÇÃO BEM-SUCEDIDA
-                    # Armazena dados do usuário na sessão Flask
-                    # session[] persiste entre requisições do mesmo usuário
-                    session['user_id'] = user['ID_USUARIO']    # ID para queries futuras
-                    session['user_name'] = user['NOME']        # Nome para exibição
-                    
-                    # Redireciona para dashboard após login
-                    return redirect(url_for('dashboard'))
-                else:
-                    # CREDENCIAIS INVÁLIDAS
-                    # flash() cria mensagem temporária para próxima página
-                    # Categoria 'error' define cor/estilo da mensagem
-                    flash('Credenciais inválidas. Tente novamente.', 'error')
-                    
-            except pymysql.Error as e:
-                flash(f'Erro ao verificar credenciais: {e}', 'error')
-            finally:
-                # SEMPRE fechar cursor e conexão para liberar recursos
-                cursor.close()
-                conn.close()
+        except ConnectionError:
+            # get_db_connection() já exibiu a mensagem de erro
+            pass
+        except MySQLdb.Error as e:
+            flash(f'Erro ao verificar credenciais: {e}', 'error')
     
     # Se chegou aqui: método GET ou login falhou
     # Renderiza template login.html com formulário
@@ -208,7 +844,7 @@ def logout():
     session.clear()
     
     # Redireciona para página de login
-    return redirect(url_for('login'))
+    return redirect(URL_LOGIN)
 
 @app.route('/dashboard')
 def dashboard():
@@ -218,13 +854,8 @@ def dashboard():
     Página principal após login bem-sucedido.
     Apresenta resumo do sistema e links de navegação.
     
-    Proteção: Verifica se usuário está logado
+    Proteção: require_login() garante que o usuário está logado
     """
-    # VERIFICAÇÃO DE AUTENTICAÇÃO
-    # Se não existe 'user_id' na sessão = usuário não logado
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
     # Renderiza template do dashboard
     # Pode passar dados do contexto: render_template('dashboard.html', dados=valor)
     return render_template('dashboard.html')
@@ -242,55 +873,43 @@ def autopecas():
     
     Parâmetros GET opcionais:
     - search: termo de busca para filtrar resultados
+    - after, after_id: nome e ID da última peça da página anterior
     """
-    # VERIFICAÇÃO DE AUTENTICAÇÃO (padrão em todas as rotas protegidas)
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
     # CAPTURA PARÂMETRO DE BUSCA
     # request.args.get('search', '') pega parâmetro da URL
     # Exemplo: /autopecas?search=filtro → search = 'filtro'
     # Valor padrão: string vazia se não fornecido
     search = request.args.get('search', '')
     
-    # Inicializa conexão e lista de resultados
-    conn = get_db_connection()
-    autopecas_list = []  # Lista vazia caso haja erro na conexão
+    # PAGINAÇÃO: última peça da página anterior
+    # Exemplo: /autopecas?after=Filtro&after_id=42
+    after_nome = request.args.get('after', '')
+    after_id = request.args.get('after_id', 0, type=int)
     
-    if conn:
-        try:
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
-            
-            # LÓGICA DE BUSCA CONDICIONAL
-            if search:
-                # BUSCA COM FILTRO
-                # LIKE %termo% busca em qualquer parte do texto
-                # Busca tanto no nome da peça quanto no número serial
-                cursor.execute("""
-                    SELECT * FROM autopeca 
-                    WHERE NOME_PECA LIKE %s OR NUM_SERIAL LIKE %s 
-                    ORDER BY NOME_PECA
-                """, (f'%{search}%', f'%{search}%'))
-            else:
-                # LISTAR TODAS (sem filtro)
-                # Ordena por nome para facilitar localização
-                cursor.execute("SELECT * FROM autopeca ORDER BY NOME_PECA")
-            
-            # fetchall() retorna TODAS as linhas encontradas
-            # Cada linha é um dicionário (devido ao DictCursor)
-            autopecas_list = cursor.fetchall()
-            
-        except pymysql.Error as e:
-            flash(f'Erro ao buscar autopeças: {e}', 'error')
-        finally:
-            # SEMPRE fechar recursos
-            cursor.close()
-            conn.close()
+    autopecas_list = []  # Lista vazia caso haja erro na conexão
     
-    # RENDERIZA TEMPLATE COM DADOS
+    try:
+        # Busca no cache; só vai ao banco se a listagem não estiver em cache
+        autopecas_list = list_autopecas(search, after_nome, after_id) or []
+    except MySQLdb.Error as e:
+        flash(f'Erro ao buscar autopeças: {e}', 'error')
+    
+    # MENSAGENS FLASH
+    # Com streaming, os cabeçalhos (incluindo o cookie de sessão) são
+    # enviados antes do template ser renderizado. Lemos as mensagens agora
+    # para removê-las da sessão; o template recebe a mesma lista depois.
+    get_flashed_messages(with_categories=True)
+    
+    # RENDERIZA TEMPLATE COM DADOS (em streaming)
+    # stream_template() envia o HTML em partes, à medida que é gerado,
+    # em vez de montar a página inteira na memória antes de responder
     # autopecas=autopecas_list: passa dados para o template HTML
     # search=search: mantém termo de busca no campo (UX)
-    return render_template('autopecas.html', autopecas=autopecas_list, search=search)
+    # has_next: página cheia indica que pode haver mais autopeças
+    return app.response_class(stream_template(
+        'autopecas.html', autopecas=autopecas_list, search=search,
+        after=after_nome, has_next=len(autopecas_list) == PAGE_SIZE
+    ))
 
 @app.route('/autopecas/add', methods=['POST'])
 def add_autopeca():
@@ -308,41 +927,13 @@ def add_autopeca():
     Campos obrigatórios: nome_peca, num_serie, estoque, estoque_minimo, preco
     Campos opcionais: descricao, compatibilidade
     """
-    # Verificação de autenticação
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    # CAPTURA DADOS DO FORMULÁRIO
-    # request.form[] acessa campos enviados via POST
+    # CAPTURA, CONVERSÃO E VALIDAÇÃO DOS DADOS DO FORMULÁRIO
+    # request.form acessa campos enviados via POST
     # Correspondem aos atributos name="" dos inputs HTML
-    nome_peca = request.form['nome_peca']
-    descricao = request.form['descricao']
-    num_serie = request.form['num_serie']
-    compatibilidade = request.form['compatibilidade']
-    
-    # CONVERSÃO DE TIPOS
-    # Campos numéricos vêm como string, precisam ser convertidos
-    try:
-        estoque = int(request.form['estoque'])
-        estoque_minimo = int(request.form['estoque_minimo'])
-        preco = float(request.form['preco'])
-    except ValueError:
-        flash('Valores numéricos inválidos. Verifique estoque e preço.', 'error')
-        return redirect(url_for('autopecas'))
-    
-    # VALIDAÇÕES DE NEGÓCIO
-    # Regras de negócio para garantir consistência dos dados
-    if estoque < 0:
-        flash('Estoque não pode ser negativo', 'error')
-        return redirect(url_for('autopecas'))
-    
-    if estoque_minimo < 0:
-        flash('Estoque mínimo não pode ser negativo', 'error')
-        return redirect(url_for('autopecas'))
-        
-    if preco <= 0:
-        flash('Preço deve ser maior que zero', 'error')
-        return redirect(url_for('autopecas'))
+    dados, erro = parse_autopeca_form(request.form)
+    if erro:
+        flash(erro, 'error')
+        return redirect(URL_AUTOPECAS)
     
     # INSERÇÃO NO BANCO DE DADOS
     conn = get_db_connection()
@@ -352,19 +943,19 @@ def add_autopeca():
             
             # SQL INSERT com campos nomeados para clareza
             # %s são placeholders que previnem SQL Injection
-            cursor.execute("""
-                INSERT INTO autopeca (NOME_PECA, DESCRICAO, ESTOQUE, ESTOQUE_MINIMO, 
-                                     NUM_SERIAL, COMPATIBILIDADE, PRECO)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (nome_peca, descricao, estoque, estoque_minimo, num_serie, compatibilidade, preco))
+            cursor.execute(SQL_AUTOPECA_INSERIR, (
+                dados.nome_peca, dados.descricao, dados.estoque, dados.estoque_minimo,
+                dados.num_serie, dados.compatibilidade, dados.preco
+            ))
             
             # commit() confirma a transação no banco
             # Sem commit(), dados não são salvos permanentemente
             conn.commit()
+            invalidate_autopecas_cache()
             
             flash('Autopeça adicionada com sucesso!', 'success')
             
-        except pymysql.Error as e:
+        except MySQLdb.Error as e:
             # Trata erros específicos do MySQL (duplicata, constraint, etc.)
             flash(f'Erro ao adicionar autopeça: {e}', 'error')
         finally:
@@ -373,7 +964,7 @@ def add_autopeca():
             conn.close()
     
     # Redireciona de volta para listagem (padrão POST-Redirect-GET)
-    return redirect(url_for('autopecas'))
+    return redirect(URL_AUTOPECAS)
 
 @app.route('/autopecas/edit/<int:id>')
 def edit_autopeca(id):
@@ -389,24 +980,20 @@ def edit_autopeca(id):
     2. Se encontrada: renderiza formulário pré-preenchido
     3. Se não encontrada: redireciona com erro
     """
-    # Verificação de autenticação
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
     # Inicializa variável para armazenar dados da peça
     autopeca = None
     conn = get_db_connection()
     
     if conn:
         try:
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
+            cursor = conn.cursor(MySQLdb.cursors.DictCursor)
             
             # Busca autopeça específica pelo ID
             # (id,) - tupla com um elemento (vírgula necessária!)
-            cursor.execute("SELECT * FROM autopeca WHERE ID_PECA = %s", (id,))
+            cursor.execute(SQL_AUTOPECA_POR_ID, (id,))
             autopeca = cursor.fetchone()  # Retorna dict ou None
             
-        except pymysql.Error as e:
+        except MySQLdb.Error as e:
             flash(f'Erro ao buscar autopeça: {e}', 'error')
         finally:
             cursor.close()
@@ -415,7 +1002,7 @@ def edit_autopeca(id):
     # VERIFICAÇÃO SE AUTOPEÇA EXISTE
     if not autopeca:
         flash('Autopeça não encontrada!', 'error')
-        return redirect(url_for('autopecas'))
+        return redirect(URL_AUTOPECAS)
     
     # Renderiza formulário de edição com dados pré-preenchidos
     # autopeca=autopeca passa dict com dados para o template
@@ -431,34 +1018,11 @@ def update_autopeca(id):
     
     Processo similar ao ADD, mas usa UPDATE SQL ao invés de INSERT
     """
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    # CAPTURA E CONVERSÃO DOS DADOS (igual ao add_autopeca)
-    nome_peca = request.form['nome_peca']
-    descricao = request.form['descricao']
-    num_serie = request.form['num_serie']
-    compatibilidade = request.form['compatibilidade']
-    
-    try:
-        estoque = int(request.form['estoque'])
-        estoque_minimo = int(request.form['estoque_minimo'])
-        preco = float(request.form['preco'])
-    except ValueError:
-        flash('Valores numéricos inválidos!', 'error')
-        return redirect(url_for('edit_autopeca', id=id))
-    
-    # VALIDAÇÕES (com redirecionamento para formulário de edição)
-    if estoque < 0:
-        flash('Estoque não pode ser negativo', 'error')
-        return redirect(url_for('edit_autopeca', id=id))
-    
-    if estoque_minimo < 0:
-        flash('Estoque mínimo não pode ser negativo', 'error')
-        return redirect(url_for('edit_autopeca', id=id))
-        
-    if preco <= 0:
-        flash('Preço deve ser maior que zero', 'error')
+    # CAPTURA, CONVERSÃO E VALIDAÇÃO DOS DADOS (igual ao add_autopeca)
+    # Em caso de erro, volta para o formulário de edição
+    dados, erro = parse_autopeca_form(request.form)
+    if erro:
+        flash(erro, 'error')
         return redirect(url_for('edit_autopeca', id=id))
     
     # ATUALIZAÇÃO NO BANCO
@@ -468,24 +1032,23 @@ def update_autopeca(id):
             cursor = conn.cursor()
             # SQL UPDATE - atualiza registro específico usando WHERE
             # Todos os campos são atualizados, mesmo que não tenham mudado
-            cursor.execute("""
-                UPDATE autopeca 
-                SET NOME_PECA=%s, DESCRICAO=%s, ESTOQUE=%s, ESTOQUE_MINIMO=%s, 
-                    NUM_SERIAL=%s, COMPATIBILIDADE=%s, PRECO=%s
-                WHERE ID_PECA=%s
-            """, (nome_peca, descricao, estoque, estoque_minimo, num_serie, compatibilidade, preco, id))
+            cursor.execute(SQL_AUTOPECA_ATUALIZAR, (
+                dados.nome_peca, dados.descricao, dados.estoque, dados.estoque_minimo,
+                dados.num_serie, dados.compatibilidade, dados.preco, id
+            ))
             
             conn.commit()
+            invalidate_autopecas_cache()
             flash('Autopeça atualizada com sucesso!', 'success')
             
-        except pymysql.Error as e:
+        except MySQLdb.Error as e:
             flash(f'Erro ao atualizar autopeça: {e}', 'error')
         finally:
             cursor.close()
             conn.close()
     
     # Volta para listagem após atualização
-    return redirect(url_for('autopecas'))
+    return redirect(URL_AUTOPECAS)
 
 @app.route('/autopecas/delete/<int:id>')
 def delete_autopeca(id):
@@ -499,13 +1062,9 @@ def delete_autopeca(id):
     Aqui usa GET por simplicidade didática.
     
     Processo:
-    1. Confirma autenticação
-    2. Executa DELETE no banco
-    3. Redireciona com feedback
+    1. Executa DELETE no banco
+    2. Redireciona com feedback
     """
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
     # EXCLUSÃO NO BANCO
     conn = get_db_connection()
     if conn:
@@ -515,19 +1074,20 @@ def delete_autopeca(id):
             # SQL DELETE - remove registro específico
             # CUIDADO: Não há confirmação adicional aqui!
             # A confirmação JavaScript está no template HTML
-            cursor.execute("DELETE FROM autopeca WHERE ID_PECA = %s", (id,))
+            cursor.execute(SQL_AUTOPECA_EXCLUIR, (id,))
             
             conn.commit()
+            invalidate_autopecas_cache()
             flash('Autopeça excluída com sucesso!', 'success')
             
-        except pymysql.Error as e:
+        except MySQLdb.Error as e:
             # Pode falhar por integridade referencial (se houver movimentações)
             flash(f'Erro ao excluir autopeça: {e}', 'error')
         finally:
             cursor.close()
             conn.close()
     
-    return redirect(url_for('autopecas'))
+    return redirect(URL_AUTOPECAS)
 
 @app.route('/estoque')
 def estoque():
@@ -540,45 +1100,62 @@ def estoque():
     - Permite registrar entradas/saídas
     - Destaca itens com estoque baixo
     """
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
     # Inicializa listas vazias para caso de erro
     autopecas_list = []
+    pecas_opcoes = []
     movimentacoes = []
+    
+    # PAGINAÇÃO: última peça da página anterior (igual a /autopecas)
+    after_nome = request.args.get('after', '')
+    after_id = request.args.get('after_id', 0, type=int)
+    
+    try:
+        # BUSCAR UMA PÁGINA DE AUTOPEÇAS
+        # Ordenadas alfabeticamente para facilitar localização
+        # Com a data da última movimentação de cada peça, servida pelo cache
+        # (feita antes de pegar a conexão abaixo, para não ocupar duas do pool)
+        autopecas_list = list_estoque(after_nome, after_id) or []
+    except MySQLdb.Error as e:
+        flash(f'Erro ao carregar dados de estoque: {e}', 'error')
+    
     conn = get_db_connection()
     
     if conn:
         try:
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
-            
-            # BUSCAR TODAS AS AUTOPEÇAS
-            # Ordenadas alfabeticamente para facilitar localização
-            cursor.execute("SELECT * FROM autopeca ORDER BY NOME_PECA")
-            autopecas_list = cursor.fetchall()
+            cursor = conn.cursor(MySQLdb.cursors.DictCursor)
             
             # BUSCAR HISTÓRICO DE MOVIMENTAÇÕES
             # JOIN com múltiplas tabelas para dados completos
+            # Da autopeça e do usuário só vêm os nomes exibidos
             # LIMIT 10: apenas as 10 movimentações mais recentes
-            cursor.execute("""
-                SELECT m.*, a.NOME_PECA, u.NOME as usuario_nome
-                FROM movimentacoes m
-                JOIN autopeca a ON m.ID_PECA = a.ID_PECA
-                JOIN usuario u ON m.ID_USUARIO = u.ID_USUARIO
-                ORDER BY m.DATA_MOVI DESC
-                LIMIT 10
-            """)
+            # (lidas em ordem pelo índice idx_mov_data, sem ordenar a tabela)
+            cursor.execute(SQL_MOVIMENTACOES_RECENTES)
             movimentacoes = cursor.fetchall()
+            cursor.close()
+            
+            # OPÇÕES DO FORMULÁRIO DE MOVIMENTAÇÃO
+            # A tabela é paginada, mas o <select> precisa de todas as peças;
+            # por isso uma consulta própria, só com as colunas exibidas.
+            # É a única consulta que lê a tabela inteira: o SSDictCursor
+            # (cursor do lado do servidor) recebe as linhas do MySQL conforme
+            # a iteração avança, sem guardar antes uma cópia de todo o
+            # resultado no cliente. A conexão fica ocupada até o fim da
+            # leitura, por isso o resultado é consumido aqui mesmo.
+            cursor = conn.cursor(MySQLdb.cursors.SSDictCursor)
+            cursor.execute(SQL_AUTOPECAS_OPCOES)
+            pecas_opcoes = tuple(cursor)
             
-        except pymysql.Error as e:
+        except MySQLdb.Error as e:
             flash(f'Erro ao carregar dados de estoque: {e}', 'error')
         finally:
             cursor.close()
             conn.close()
     
-    # Passa ambas as listas para o template
+    # Passa as listas para o template
     # Template pode iterar sobre elas e exibir dados
-    return render_template('estoque.html', autopecas=autopecas_list, movimentacoes=movimentacoes)
+    return render_template('estoque.html', autopecas=autopecas_list, pecas_opcoes=pecas_opcoes,
+                           movimentacoes=movimentacoes,
+                           after=after_nome, has_next=len(autopecas_list) == PAGE_SIZE)
 
 @app.route('/movimentacao', methods=['POST'])
 def add_movimentacao():
@@ -591,74 +1168,97 @@ def add_movimentacao():
     - ENTRADA: aumenta estoque (compras, devoluções)
     - SAÍDA: diminui estoque (vendas, perdas)
     
-    Processo:
+    Processo (em uma única transação):
     1. Valida dados recebidos
-    2. Verifica se há estoque suficiente (para saídas)
+    2. Atualiza estoque da autopeça, somente se houver saldo suficiente
     3. Registra movimentação na tabela de histórico
-    4. Atualiza estoque da autopeça
-    5. Alerta se estoque ficou baixo
+    4. Alerta se estoque ficou baixo
     """
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
     id_peca = int(request.form['id_peca'])
     quantidade = int(request.form['quantidade'])
-    tipo_movimentacao = request.form['tipo_movimentacao']
+    tipo_movimentacao = request.form['tipo_movimentacao'].upper()
     data = request.form.get('data')
     
+    if quantidade <= 0:
+        flash('Quantidade deve ser maior que zero', 'error')
+        return redirect(URL_ESTOQUE)
+    
     if not data:
         data = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
+    # Variação do estoque: positiva na entrada, negativa na saída
+    delta = quantidade if tipo_movimentacao == 'ENTRADA' else -quantidade
+    
     conn = get_db_connection()
     if conn:
-        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        cursor = conn.cursor(MySQLdb.cursors.DictCursor)
         
         try:
-            # Buscar autopeça atual
-            cursor.execute("SELECT * FROM autopeca WHERE ID_PECA = %s", (id_peca,))
+            # TRANSAÇÃO EM UMA ÚNICA IDA AO BANCO
+            # Todos os comandos vão juntos em um só execute() (multi-statements),
+            # dentro de uma transação explícita:
+            # 1. UPDATE atômico: a verificação de saldo fica no próprio UPDATE,
+            #    então duas saídas simultâneas não deixam o estoque negativo
+            # 2. @movimentada guarda quantas linhas o UPDATE alterou (0 ou 1)
+            # 3. O histórico só é inserido se o estoque foi atualizado
+            # 4. Lê o estoque resultante para o alerta de estoque mínimo
+            cursor.execute(SQL_MOVIMENTACAO_REGISTRAR, (
+                delta, id_peca, delta,
+                g.user_id, id_peca, data, quantidade, tipo_movimentacao,
+                id_peca
+            ))
+            
+            # Avança pelos resultados dos comandos até o SELECT (o único com colunas)
+            while cursor.description is None and cursor.nextset():
+                pass
             autopeca = cursor.fetchone()
             
+            # Consome os resultados restantes (COMMIT); erros aparecem aqui
+            while cursor.nextset():
+                pass
+            
             if not autopeca:
                 flash('Autopeça não encontrada!', 'error')
-                return redirect(url_for('estoque'))
+                return redirect(URL_ESTOQUE)
             
-            # Calcular novo estoque
-            estoque_atual = autopeca['ESTOQUE']
+            if not autopeca['movimentada']:
+                # Nenhuma linha alterada: saldo insuficiente
+                flash('Estoque insuficiente para esta movimentação!', 'error')
+                return redirect(URL_ESTOQUE)
             
-            if tipo_movimentacao.upper() == 'ENTRADA':
-                novo_estoque = estoque_atual + quantidade
-            else:  # saída
-                novo_estoque = estoque_atual - quantidade
-                if novo_estoque < 0:
-                    flash('Estoque insuficiente para esta movimentação!', 'error')
-                    return redirect(url_for('estoque'))
-            
-            # Inserir movimentação
-            cursor.execute("""
-                INSERT INTO movimentacoes (ID_USUARIO, ID_PECA, DATA_MOVI, QUANTIDADE, TIPO_MOVI)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (session['user_id'], id_peca, data, quantidade, tipo_movimentacao.upper()))
-            
-            # Atualizar estoque da autopeça
-            cursor.execute("""
-                UPDATE autopeca SET ESTOQUE = %s WHERE ID_PECA = %s
-            """, (novo_estoque, id_peca))
-            
-            conn.commit()
+            invalidate_autopecas_cache()
             
             # Verificar estoque mínimo
-            if novo_estoque < autopeca['ESTOQUE_MINIMO']:
-                flash(f'ALERTA: Estoque da peça "{autopeca["NOME_PECA"]}" está abaixo do mínimo! Estoque atual: {novo_estoque}, Mínimo: {autopeca["ESTOQUE_MINIMO"]}', 'warning')
+            if autopeca['ESTOQUE'] < autopeca['ESTOQUE_MINIMO']:
+                flash(f'ALERTA: Estoque da peça "{autopeca["NOME_PECA"]}" está abaixo do mínimo! Estoque atual: {autopeca["ESTOQUE"]}, Mínimo: {autopeca["ESTOQUE_MINIMO"]}', 'warning')
             else:
                 flash('Movimentação registrada com sucesso!', 'success')
             
-        except pymysql.Error as e:
+        except MySQLdb.Error as e:
+            # Desfaz a atualização do estoque se algum comando falhou
+            conn.rollback()
             flash(f'Erro ao registrar movimentação: {e}', 'error')
         finally:
             cursor.close()
             conn.close()
     
-    return redirect(url_for('estoque'))
+    return redirect(URL_ESTOQUE)
+
+# ================================================================================
+# URLS FIXAS PRÉ-CALCULADAS
+# ================================================================================
+
+# As rotas abaixo não têm parâmetros, então sua URL nunca muda.
+# Calculamos uma única vez, ao carregar o módulo (depois de registrar as
+# rotas), em vez de chamar url_for() a cada redirecionamento.
+# Rotas com parâmetros (ex.: edit_autopeca com id) continuam usando url_for().
+# Observação: o contexto de teste usa APPLICATION_ROOT da configuração; se a
+# aplicação for publicada sob um prefixo (SCRIPT_NAME), configure-o ali.
+with app.test_request_context():
+    URL_LOGIN = url_for('login')
+    URL_DASHBOARD = url_for('dashboard')
+    URL_AUTOPECAS = url_for('autopecas')
+    URL_ESTOQUE = url_for('estoque')
 
 # ================================================================================
 # EXECUÇÃO DA APLICAÇÃO
@@ -671,17 +1271,23 @@ if __name__ == '__main__':
     Executa o servidor Flask quando o script é rodado diretamente.
     
     Parâmetros:
-    - debug=True: Ativa modo de desenvolvimento
-      * Recarrega automaticamente quando código muda
+    - debug=DEBUG: Ativa modo de desenvolvimento se SAEP_DEBUG=1
+      * Recarrega automaticamente quando código ou templates mudam
       * Mostra erros detalhados no navegador
       * NUNCA usar debug=True em produção!
     
     Para executar:
     python app.py
+    SAEP_DEBUG=1 python app.py    (modo debug)
     
     Servidor iniciará em: http://127.0.0.1:5000
+    (o servidor de desenvolvimento do Flask já atende cada requisição
+    em sua própria thread por padrão)
+    
+    Em produção use um servidor WSGI com workers em threads:
+    gunicorn -w $(nproc) -k gthread --threads 16 -b 0.0.0.0:5000 app:app
     """
-    app.run(debug=True)
+    app.run(debug=DEBUG)
 
 
 # ================================================================================
@@ -701,11 +1307,11 @@ PASSO A PASSO PARA CONFIGURAR O SISTEMA:
    c) Criar banco 'saep_db'
    d) Executar SQL de criação das tabelas:
 
-   CREATE TABLE usuarios (
+   CREATE TABLE usuario (
        ID_USUARIO INT AUTO_INCREMENT PRIMARY KEY,
        EMAIL VARCHAR(100) NOT NULL UNIQUE,
        SENHA VARCHAR(255) NOT NULL,
-       NOME_COMPLETO VARCHAR(150) NOT NULL
+       NOME VARCHAR(150) NOT NULL
    );
 
    CREATE TABLE autopeca (
@@ -719,9 +1325,52 @@ PASSO A PASSO PARA CONFIGURAR O SISTEMA:
        COMPATIBILIDADE VARCHAR(200)
    );
 
+   -- TIPO_MOVI: 'ENTRADA' ou 'SAÍDA' (gravado em maiúsculas pela rota /movimentacao)
+   CREATE TABLE movimentacoes (
+       ID_MOVI INT AUTO_INCREMENT PRIMARY KEY,
+       ID_USUARIO INT NOT NULL,
+       ID_PECA INT NOT NULL,
+       DATA_MOVI DATETIME NOT NULL,
+       QUANTIDADE INT NOT NULL,
+       TIPO_MOVI VARCHAR(10) NOT NULL
+   );
+
    -- Inserir usuário de teste
-   INSERT INTO usuarios (EMAIL, SENHA, NOME_COMPLETO) 
-   VALUES ('admin@saep.com', 'admin123', 'Administrador');
+   -- A SENHA é gravada como hash Argon2, nunca em texto puro. Gere o hash com:
+   -- python -c "from argon2 import PasswordHasher; print(PasswordHasher().hash('admin123'))"
+   -- (Usuários já cadastrados com senha em texto puro continuam entrando
+   -- normalmente: o primeiro login regrava a SENHA como hash Argon2.)
+   INSERT INTO usuario (EMAIL, SENHA, NOME) 
+   VALUES ('admin@saep.com', '<hash gerado acima>', 'Administrador');
+
+   e) Criar os índices usados pelas consultas do app.py
+      (sem eles, login, /autopecas e /estoque varrem a tabela inteira
+      à medida que os dados crescem):
+
+   -- usuario: a busca do login (WHERE EMAIL = ...) já usa o índice UNIQUE
+   -- de EMAIL; este índice de cobertura responde o login só com o índice,
+   -- sem ler a linha completa da tabela
+   CREATE INDEX idx_usuario_login ON usuario (EMAIL, ID_USUARIO, NOME, SENHA);
+
+   -- autopeca: listagem ordenada e paginada (ORDER BY NOME_PECA, ID_PECA)
+   -- (também atende o <select> de /estoque, ORDER BY NOME_PECA, ID_PECA)
+   CREATE INDEX idx_autopeca_nome ON autopeca (NOME_PECA, ID_PECA);
+
+   -- autopeca: busca por nome/número de série (MATCH ... AGAINST)
+   ALTER TABLE autopeca ADD FULLTEXT idx_ft_autopeca (NOME_PECA, NUM_SERIAL);
+
+   -- movimentacoes: as 10 mais recentes (ORDER BY DATA_MOVI DESC LIMIT 10)
+   CREATE INDEX idx_mov_data ON movimentacoes (DATA_MOVI DESC);
+
+   -- movimentacoes: JOIN com autopeca e última movimentação de cada peça
+   -- (MAX(DATA_MOVI) por ID_PECA); também atende WHERE ID_PECA = ...
+   CREATE INDEX idx_mov_peca_data ON movimentacoes (ID_PECA, DATA_MOVI);
+
+   -- movimentacoes: JOIN com usuario
+   CREATE INDEX idx_mov_user ON movimentacoes (ID_USUARIO);
+
+   Para conferir se uma consulta usa os índices, execute-a com EXPLAIN
+   no phpMyAdmin (a coluna "key" mostra o índice escolhido).
 
 3. ESTRUTURA DE ARQUIVOS:
    projeto_saep/
@@ -735,11 +1384,20 @@ PASSO A PASSO PARA CONFIGURAR O SISTEMA:
        └── estoque.html
 
 4. INSTALAÇÃO DAS DEPENDÊNCIAS:
-   pip install flask pymysql
+   pip install flask mysqlclient DBUtils argon2-cffi cachetools dogpile.cache pydantic orjson gunicorn
+   (no Linux, o mysqlclient precisa de libmysqlclient-dev/default-libmysqlclient-dev
+   e pkg-config; no Windows há wheels prontos no pip)
 
    Ou criar requirements.txt:
    Flask==2.3.3
-   PyMySQL==1.1.2
+   mysqlclient==2.2.4
+   DBUtils==3.1.0
+   argon2-cffi==23.1.0
+   cachetools==5.3.3
+   dogpile.cache==1.3.3
+   pydantic==2.7.1
+   orjson==3.10.3
+   gunicorn==21.2.0
 
    E executar: pip install -r requirements.txt
 
@@ -752,6 +1410,13 @@ PASSO A PASSO PARA CONFIGURAR O SISTEMA:
 
 6. EXECUTAR A APLICAÇÃO:
    python app.py
+
+   Em desenvolvimento (recarga automática e erros detalhados):
+   SAEP_DEBUG=1 python app.py
+   (no Windows: set SAEP_DEBUG=1 e depois python app.py)
+
+   Em produção (várias requisições simultâneas):
+   gunicorn -w $(nproc) -k gthread --threads 16 -b 0.0.0.0:5000 app:app
    
    Acessar: http://localhost:5000
    Login: admin@saep.com / admin123
@@ -773,10 +1438,7 @@ PASSO A PASSO PARA CONFIGURAR O SISTEMA:
 
 9. MELHORIAS PARA PRODUÇÃO:
    - Usar variáveis de ambiente para configurações
-   - Implementar hash de senhas (werkzeug.security)
-   - Adicionar validação de dados robusta
    - Configurar HTTPS
-   - Usar gunicorn ou similar para servir
    - Implementar logs estruturados
    - Adicionar testes unitários
 
@@ -785,13 +1447,13 @@ PASSO A PASSO PARA CONFIGURAR O SISTEMA:
     - Banco: MySQL
     - Frontend: HTML5 + CSS3 + JavaScript
     - Templates: Jinja2
-    - Conector DB: PyMySQL
-    - Servidor: Flask development server
+    - Conector DB: mysqlclient/MySQLdb (com pool de conexões DBUtils)
+    - Servidor: Flask development server / gunicorn (produção)
 
 ESTE PROJETO É EDUCACIONAL E DEMONSTRA:
 - Padrão MVC com Flask
 - Operações CRUD completas
-- Autenticação simples
+- Autenticação com hash de senhas (Argon2)
 - Interface responsiva
 - Integração com banco de dados
 - Tratamento de erros
@@ -800,6 +1462,6 @@ ESTE PROJETO É EDUCACIONAL E DEMONSTRA:
 
 Para dúvidas ou melhorias, consulte a documentação oficial:
 - Flask: https://flask.palletsprojects.com
-- PyMySQL: https://pymysql.readthedocs.io
+- mysqlclient: https://mysqlclient.readthedocs.io
 - Jinja2: https://jinja.palletsprojects.com
 """
\ No newline at end of file